@@ -9,8 +9,9 @@ individual calibration, then combines and stacks all nights together.
 Features:
 - Auto-detection of set1, set2, set3, etc. folders
 - Synthetic bias calibration per set (no dark frames required)
+- Sets calibrated in parallel with siril-cli when it is available
 - Flat field correction per set
-- Combines all calibrated lights with symbolic links
+- Combines all calibrated lights with hard links (symbolic links across filesystems)
 - Global registration across all nights
 - Configurable sigma rejection stacking
 - OSC camera support with debayering
@@ -18,6 +19,8 @@ Features:
 Requirements:
 - sirilpy
 - PyQt5
+- liburing==2024.5.3 (optional, Linux only: batches the hard link syscalls;
+  newer releases replaced the io_uring_* API used here and are ignored)
 
 License: MIT
 Copyright (c) 2025
@@ -43,19 +46,31 @@ SOFTWARE.
 
 import sys
 import os
+import errno
+import functools
 import json
+import math
+import multiprocessing
+import platform
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import deque
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QDoubleSpinBox, QTextEdit, QFileDialog, 
+    QPushButton, QLabel, QDoubleSpinBox, QPlainTextEdit, QFileDialog, 
     QGroupBox, QGridLayout, QMessageBox, QProgressBar, QCheckBox,
     QLineEdit
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QFont
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThread, QThreadPool, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QColor, QTextCharFormat, QTextCursor
 
 try:
     import sirilpy
@@ -64,12 +79,18 @@ try:
 except ImportError:
     SIRILPY_AVAILABLE = False
 
+try:
+    import liburing
+    # Only the 2024.5.3 binding API (io_uring/io_uring_cqe/io_uring_prep_linkat) is supported
+    LIBURING_AVAILABLE = platform.system() == "Linux" and hasattr(liburing, "io_uring_prep_linkat")
+except ImportError:
+    liburing = None
+    LIBURING_AVAILABLE = False
+
 
 class SirilWorker(QThread):
     """Worker thread for running Siril commands."""
     
-    log_message = pyqtSignal(str, str)  # message, color
-    progress_update = pyqtSignal(int)  # percentage
     finished = pyqtSignal(bool, str)  # success, message
     
     def __init__(self, task_func, *args, **kwargs):
@@ -78,6 +99,33 @@ class SirilWorker(QThread):
         self.args = args
         self.kwargs = kwargs
         self.siril = None
+        # Log lines are buffered here and drained by the GUI on a timer
+        self._log_buffer = deque()
+        self._log_lock = threading.Lock()
+        # Progress percentage, updated from pool threads and polled by the GUI
+        self.progress = multiprocessing.Value('i', 0)
+    
+    def log(self, message: str, color: str = "black"):
+        """Queue a log message for the GUI."""
+        with self._log_lock:
+            self._log_buffer.append((message, color))
+    
+    def drain_log(self) -> List[Tuple[str, str]]:
+        """Take all queued log messages."""
+        with self._log_lock:
+            batch = list(self._log_buffer)
+            self._log_buffer.clear()
+        return batch
+    
+    def set_progress(self, percent: int):
+        """Set the progress percentage."""
+        with self.progress.get_lock():
+            self.progress.value = percent
+    
+    def add_progress(self, percent: int):
+        """Atomically advance the progress percentage."""
+        with self.progress.get_lock():
+            self.progress.value += percent
     
     def run(self):
         """Execute the task function."""
@@ -88,30 +136,80 @@ class SirilWorker(QThread):
             else:
                 self.finished.emit(False, "Task completed with errors")
         except Exception as e:
-            self.log_message.emit(f"Error: {str(e)}", "red")
+            self.log(f"Error: {str(e)}", "red")
             self.finished.emit(False, str(e))
     
     def cmd(self, *args):
         """Execute Siril command with logging."""
-        cmd_str = " ".join(str(arg) for arg in args)
-        self.log_message.emit(f"$ {cmd_str}", "blue")
+        # Most commands are built from strings only; skip the str() calls for those
+        if all(type(arg) is str for arg in args):
+            cmd_str = " ".join(args)
+        else:
+            cmd_str = " ".join(map(str, args))
+        self.log(f"$ {cmd_str}", "blue")
         try:
             if self.siril:
                 self.siril.cmd(*args)
         except Exception as e:
-            self.log_message.emit(f"Command failed: {e}", "red")
+            self.log(f"Command failed: {e}", "red")
             raise
 
 
+class TaskSignals(QObject):
+    """Signals for BackgroundTask, since QRunnable is not a QObject."""
+    
+    finished = pyqtSignal(object)  # result
+    failed = pyqtSignal(str)  # error message
+
+
+class BackgroundTask(QRunnable):
+    """Run a function on a QThreadPool and report its result through signals."""
+    
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+    
+    def run(self):
+        """Execute the function."""
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
 class MultiNightStackerGUI(QMainWindow):
     """Main application window."""
     
+    _SET_DIR_RE = re.compile(r"^set(\d+)$")
+    _PP_LIGHT_RE = re.compile(r"^pp_light_(\d+)\.fit$")
+    
+    # os.link errors meaning the filesystem can't hard link these frames
+    _NO_HARDLINK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+    
+    _COLOR_MAP = {
+        "black": "#000000",
+        "red": "#FF0000",
+        "green": "#00AA00",
+        "blue": "#0000FF",
+        "orange": "#FF8800",
+    }
+    
     def __init__(self, siril_instance=None):
         super().__init__()
         self.siril = siril_instance
         self.working_dir = None
         self.worker = None
         self.detected_sets = []
+        self._set_scan_interactive = False
+        self._close_requested = False
+        self._settings_saved = False
+        self._run_settings = {}
+        self._run_sets = []
         
         self.init_ui()
         self.load_settings()
@@ -177,8 +275,8 @@ class MultiNightStackerGUI(QMainWindow):
         seq_layout.addWidget(QLabel("Sequence Name:"), 0, 0)
         self.seq_name_edit = QLineEdit()
         # Default to today's date in YYYYMMDD_seq format
-        default_name = datetime.now().strftime("%Y%m%d_seq")
-        self.seq_name_edit.setText(default_name)
+        self._default_seq_name = datetime.now().strftime("%Y%m%d_seq")
+        self.seq_name_edit.setText(self._default_seq_name)
         self.seq_name_edit.setToolTip("Name for combined sequence (e.g., 20251116_seq)")
         seq_layout.addWidget(self.seq_name_edit, 0, 1)
         
@@ -202,10 +300,21 @@ class MultiNightStackerGUI(QMainWindow):
         self.use_flats_check.setToolTip("Each set must have a flats/ folder")
         calib_layout.addWidget(self.use_flats_check, 1, 0, 1, 2)
         
+        self.median_flats_check = QCheckBox("Median-only Flat Stacking")
+        self.median_flats_check.setChecked(True)
+        self.median_flats_check.setToolTip("Stack flats with a single-pass median instead of sigma rejection")
+        calib_layout.addWidget(self.median_flats_check, 2, 0, 1, 2)
+        
         self.debayer_check = QCheckBox("Debayer (OSC Camera)")
         self.debayer_check.setChecked(True)
         self.debayer_check.setToolTip("Enable for color cameras (OSC/DSLR)")
-        calib_layout.addWidget(self.debayer_check, 2, 0, 1, 2)
+        calib_layout.addWidget(self.debayer_check, 3, 0, 1, 2)
+        
+        self.parallel_cli_check = QCheckBox("Parallel Calibration with siril-cli")
+        self.parallel_cli_check.setChecked(True)
+        self.parallel_cli_check.setToolTip("Calibrate sets concurrently in headless siril-cli instances "
+                                           "when siril-cli is on PATH")
+        calib_layout.addWidget(self.parallel_cli_check, 4, 0, 1, 2)
         
         calib_group.setLayout(calib_layout)
         main_layout.addWidget(calib_group)
@@ -270,15 +379,30 @@ class MultiNightStackerGUI(QMainWindow):
         log_group = QGroupBox("Processing Log")
         log_layout = QVBoxLayout()
         
-        self.log_text = QTextEdit()
+        self.log_text = QPlainTextEdit()
         self.log_text.setReadOnly(True)
         self.log_text.setFont(QFont("Monospace", 9))
         self.log_text.setMinimumHeight(200)
+        # Bound scrollback so long sessions don't grow memory and repaint cost
+        self.log_text.setMaximumBlockCount(5000)
+        
+        self._color_formats = {}
+        for name, hex_color in self._COLOR_MAP.items():
+            char_format = QTextCharFormat()
+            char_format.setForeground(QColor(hex_color))
+            self._color_formats[name] = char_format
+        self._default_color_format = self._color_formats["black"]
         log_layout.addWidget(self.log_text)
         
         log_group.setLayout(log_layout)
         main_layout.addWidget(log_group)
         
+        # Worker log messages and progress are polled at 10 Hz rather than
+        # signalled per line or per step
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(100)
+        self.poll_timer.timeout.connect(self.poll_worker)
+        
         self.log("Multi-Night Stacker initialized", "green")
         
         if not SIRILPY_AVAILABLE:
@@ -286,64 +410,105 @@ class MultiNightStackerGUI(QMainWindow):
     
     def log(self, message: str, color: str = "black"):
         """Add message to log with color."""
-        color_map = {
-            "black": "#000000",
-            "red": "#FF0000",
-            "green": "#00AA00",
-            "blue": "#0000FF",
-            "orange": "#FF8800",
-        }
+        self.append_log([(message, color)])
+    
+    def poll_worker(self):
+        """Pick up the worker's queued log messages and current progress."""
+        self.flush_worker_log()
+        if self.worker:
+            self.progress_bar.setValue(self.worker.progress.value)
+    
+    def flush_worker_log(self):
+        """Append the worker's queued log messages in one update."""
+        if not self.worker:
+            return
         
-        hex_color = color_map.get(color, color_map["black"])
-        self.log_text.append(f'<span style="color: {hex_color};">{message}</span>')
+        batch = self.worker.drain_log()
+        if batch:
+            self.append_log(batch)
+    
+    def append_log(self, entries: List[Tuple[str, str]]):
+        """Insert (message, color) lines at the end of the log."""
+        # Only follow new output if the user hasn't scrolled back
+        scrollbar = self.log_text.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+        
+        cursor = QTextCursor(self.log_text.document())
+        cursor.movePosition(QTextCursor.End)
+        color_formats = self._color_formats
+        default_format = self._default_color_format
+        
+        for message, color in entries:
+            if not cursor.atStart():
+                cursor.insertBlock()
+            cursor.insertText(message, color_formats.get(color, default_format))
+        
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
     
-    def detect_sets(self):
-        """Detect set1, set2, etc. folders in working directory."""
+    @classmethod
+    def scan_sets(cls, working_dir: str) -> Tuple[str, List[Tuple[str, bool]]]:
+        """List set1, set2, etc. folders in working_dir and whether each has a lights/ folder."""
+        # Look for set1, set2, set3, etc. in a single pass over the working directory
+        set_dirs = []
+        with os.scandir(working_dir) as entries:
+            for entry in entries:
+                match = cls._SET_DIR_RE.match(entry.name)
+                if match and entry.is_dir():
+                    set_dirs.append((int(match.group(1)), entry.name, entry.path))
+        
+        sets = [
+            (set_name, os.path.isdir(os.path.join(set_path, "lights")))
+            for _, set_name, set_path in sorted(set_dirs)
+        ]
+        return working_dir, sets
+    
+    def detect_sets(self, interactive: bool = False):
+        """Detect set1, set2, etc. folders in working directory without blocking the GUI."""
         if not self.working_dir:
             return
         
-        working_path = Path(self.working_dir)
         self.detected_sets = []
+        self._set_scan_interactive = interactive
+        self.sets_label.setText("Scanning for sets...")
+        self.sets_label.setStyleSheet("color: #666; font-style: italic;")
+        self.start_button.setEnabled(False)
         
-        # Look for set1, set2, set3, etc.
-        i = 1
-        while True:
-            set_path = working_path / f"set{i}"
-            if not set_path.exists():
-                break
-            
+        task = BackgroundTask(self.scan_sets, self.working_dir)
+        task.signals.finished.connect(self.on_sets_detected)
+        task.signals.failed.connect(self.on_sets_scan_failed)
+        QThreadPool.globalInstance().start(task)
+    
+    def on_sets_detected(self, result):
+        """Update the detected sets once a scan finishes."""
+        working_dir, sets = result
+        if working_dir != self.working_dir:
+            return  # Superseded by a newer directory selection
+        
+        self.detected_sets = []
+        for set_name, has_lights in sets:
             # Verify it has lights folder
-            lights_path = set_path / "lights"
-            if lights_path.exists():
-                self.detected_sets.append(f"set{i}")
-                self.log(f"Detected: {set_path.name}", "blue")
+            if has_lights:
+                self.detected_sets.append(set_name)
+                self.log(f"Detected: {set_name}", "blue")
             else:
-                self.log(f"Skipping {set_path.name}: no lights/ folder", "orange")
-            
-            i += 1
+                self.log(f"Skipping {set_name}: no lights/ folder", "orange")
         
         if self.detected_sets:
             sets_text = f"Detected sets: {', '.join(self.detected_sets)} ({len(self.detected_sets)} total)"
             self.sets_label.setText(sets_text)
             self.sets_label.setStyleSheet("color: green; font-weight: bold;")
-            self.start_button.setEnabled(True)
+            # A running worker re-enables Start from on_processing_finished
+            self.start_button.setEnabled(not (self.worker and self.worker.isRunning()))
+            
+            if self._set_scan_interactive:
+                self.log(f"Working directory set: {working_dir}", "green")
         else:
             self.sets_label.setText("No valid sets detected (expecting set1/, set2/, etc. with lights/ folders)")
             self.sets_label.setStyleSheet("color: red;")
             self.start_button.setEnabled(False)
-    
-    def select_directory(self):
-        """Select working directory."""
-        directory = QFileDialog.getExistingDirectory(self, "Select Working Directory")
-        
-        if directory:
-            self.working_dir = directory
-            self.dir_label.setText(directory)
             
-            # Detect sets
-            self.detect_sets()
-            
-            if not self.detected_sets:
+            if self._set_scan_interactive:
                 QMessageBox.warning(
                     self, "No Sets Found",
                     "No valid set folders detected.\n\n"
@@ -356,8 +521,23 @@ class MultiNightStackerGUI(QMainWindow):
                     "    flats/\n"
                     "  ..."
                 )
-            else:
-                self.log(f"Working directory set: {directory}", "green")
+    
+    def on_sets_scan_failed(self, message: str):
+        """Report a failed set scan."""
+        self.log(f"Could not scan working directory: {message}", "red")
+        self.sets_label.setText("Could not scan working directory")
+        self.sets_label.setStyleSheet("color: red;")
+    
+    def select_directory(self):
+        """Select working directory."""
+        directory = QFileDialog.getExistingDirectory(self, "Select Working Directory")
+        
+        if directory:
+            self.working_dir = directory
+            self.dir_label.setText(directory)
+            
+            # Detect sets in the background; results arrive in on_sets_detected
+            self.detect_sets(interactive=True)
     
     def start_processing(self):
         """Start the full processing workflow."""
@@ -369,12 +549,18 @@ class MultiNightStackerGUI(QMainWindow):
             QMessageBox.warning(self, "No Sets", "No valid sets detected. Please check directory structure.")
             return
         
+        if self.worker and self.worker.isRunning():
+            QMessageBox.warning(self, "Already Running", "Processing is already in progress.")
+            return
+        
         if not SIRILPY_AVAILABLE:
             QMessageBox.critical(self, "Missing Dependency", 
                                  "sirilpy is not available. This script must be run from Siril.")
             return
         
-        seq_name = self.seq_name_edit.text().strip()
+        # Snapshot the GUI state so the run is unaffected by later edits
+        settings = self.current_settings()
+        seq_name = settings["sequence_name"]
         if not seq_name:
             QMessageBox.warning(self, "No Sequence Name", "Please enter a sequence name.")
             return
@@ -385,7 +571,7 @@ class MultiNightStackerGUI(QMainWindow):
             f"Process {len(self.detected_sets)} sets?\n\n"
             f"Sets: {', '.join(self.detected_sets)}\n"
             f"Sequence name: {seq_name}\n"
-            f"Sigma rejection: {self.sigma_low_spin.value()}/{self.sigma_high_spin.value()}\n\n"
+            f"Sigma rejection: {settings['sigma_low']}/{settings['sigma_high']}\n\n"
             f"This will:\n"
             f"1. Calibrate each set individually\n"
             f"2. Combine all calibrated lights\n"
@@ -401,192 +587,484 @@ class MultiNightStackerGUI(QMainWindow):
         self.start_button.setEnabled(False)
         self.progress_bar.setValue(0)
         
+        # Resolve paths once and keep them with the run's settings, so picking
+        # another directory mid-run can't redirect it
+        settings["wd_path"] = Path(self.working_dir)
+        settings["combined_dir"] = settings["wd_path"] / "multi_night_combined"
+        
+        # Keep the run's snapshot for the completion report
+        self._run_settings = settings
+        self._run_sets = list(self.detected_sets)
+        
         # Start worker thread
-        self.worker = SirilWorker(self.process_workflow)
-        self.worker.log_message.connect(self.log)
-        self.worker.progress_update.connect(self.progress_bar.setValue)
+        self.worker = SirilWorker(self.process_workflow, self._run_settings, self._run_sets)
         self.worker.finished.connect(self.on_processing_finished)
         self.worker.start()
+        self.poll_timer.start()
     
-    def process_workflow(self, worker: SirilWorker):
+    def process_workflow(self, worker: SirilWorker, settings: dict, sets: List[str]):
         """Main processing workflow executed in worker thread."""
         try:
-            worker.log_message.emit("=== Starting Multi-Night Processing ===", "green")
+            worker.log("=== Starting Multi-Night Processing ===", "green")
             worker.siril = self.siril
             
-            seq_name = self.seq_name_edit.text().strip()
+            seq_name = settings["sequence_name"]
+            working_dir = str(settings["wd_path"])
+            combined_dir = settings["combined_dir"]
             
             # Change to working directory
-            worker.cmd("cd", self.working_dir)
-            worker.progress_update.emit(5)
+            worker.cmd("cd", working_dir)
+            worker.set_progress(5)
             
             # Create multi_night_combined directory
-            combined_dir = Path(self.working_dir) / "multi_night_combined"
             combined_dir.mkdir(exist_ok=True)
-            worker.log_message.emit(f"Created directory: {combined_dir}", "blue")
+            worker.log(f"Created directory: {combined_dir}", "blue")
             
             # Process each set
-            num_sets = len(self.detected_sets)
-            base_progress = 5
+            num_sets = len(sets)
             progress_per_set = 60 // num_sets if num_sets > 0 else 0
             
-            for idx, set_name in enumerate(self.detected_sets):
-                worker.log_message.emit(f"\n=== Processing {set_name} ===", "green")
-                self.process_set(worker, set_name)
-                worker.progress_update.emit(base_progress + (idx + 1) * progress_per_set)
+            siril_cli = shutil.which("siril-cli") if settings["parallel_cli"] else None
+            if siril_cli:
+                # Sets are independent, so calibrate them concurrently in
+                # headless Siril instances
+                cores = os.cpu_count() or 1
+                max_workers = min(num_sets, cores)
+                worker.log(
+                    f"\n=== Processing {num_sets} sets with siril-cli ({max_workers} parallel) ===", "green"
+                )
+                worker.log(f"Using {siril_cli}: {self.siril_cli_version(siril_cli)}", "blue")
+                
+                # Each instance is multi-threaded and sizes its memory independently,
+                # so split the cores and Siril's default 0.9 memory ratio between them
+                limits = [
+                    ["setcpu", str(max(1, cores // max_workers))],
+                    ["setmem", f"{max(0.05, 0.9 / max_workers):.2f}"],
+                ]
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {
+                        executor.submit(self.process_set_cli, worker, set_name, settings, siril_cli,
+                                        limits, progress_per_set): set_name
+                        for set_name in sets
+                    }
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception:
+                            # Don't let queued sets calibrate before the error is reported
+                            for pending in futures:
+                                pending.cancel()
+                            raise
+                        if worker.isInterruptionRequested():
+                            # Sets already running finish; queued ones never start
+                            for pending in futures:
+                                pending.cancel()
+                            break
+            else:
+                for set_name in sets:
+                    if worker.isInterruptionRequested():
+                        break
+                    worker.log(f"\n=== Processing {set_name} ===", "green")
+                    self.process_set(worker, set_name, settings, progress_per_set)
+                worker.cmd("cd", working_dir)
             
-            worker.log_message.emit("\n=== Combining All Nights ===", "green")
-            self.combine_sequences(worker, seq_name)
-            worker.progress_update.emit(70)
+            if worker.isInterruptionRequested():
+                worker.log("Processing stopped", "orange")
+                return False
             
-            worker.log_message.emit("\n=== Registering Across All Nights ===", "green")
-            self.register_combined(worker, seq_name)
-            worker.progress_update.emit(85)
+            worker.log("\n=== Combining All Nights ===", "green")
+            frames = self.combine_sequences(worker, seq_name, sets, settings)
+            worker.set_progress(70)
             
-            worker.log_message.emit("\n=== Stacking Final Result ===", "green")
-            self.stack_combined(worker, seq_name)
-            worker.progress_update.emit(100)
+            if worker.isInterruptionRequested():
+                worker.log("Processing stopped", "orange")
+                return False
             
-            worker.log_message.emit("\n=== Processing Complete! ===", "green")
-            worker.log_message.emit(f"Final result: {self.working_dir}/{seq_name}_stacked.fit", "green")
+            worker.log("\n=== Registering Across All Nights ===", "green")
+            if hasattr(os, "posix_fadvise"):
+                # Start reading the first frames into the page cache before Siril
+                # asks for them. Only prefetch what fits in memory, or early frames
+                # get evicted first.
+                prefetch = self.frames_within(frames, self.prefetch_budget())
+                if prefetch:
+                    worker.log(f"Prefetching {len(prefetch)} of {len(frames)} frames", "blue")
+                    self.advise_frames(prefetch, os.POSIX_FADV_WILLNEED)
+            self.register_combined(worker, seq_name, settings)
+            worker.set_progress(85)
+            
+            if worker.isInterruptionRequested():
+                worker.log("Processing stopped", "orange")
+                return False
+            
+            worker.log("\n=== Stacking Final Result ===", "green")
+            self.stack_combined(worker, seq_name, settings)
+            worker.set_progress(100)
+            
+            worker.log("\n=== Processing Complete! ===", "green")
+            worker.log(f"Final result: {working_dir}/{seq_name}_stacked.fit", "green")
             
             # Close Siril
             worker.cmd("close")
             
         except Exception as e:
-            worker.log_message.emit(f"Error in workflow: {e}", "red")
+            worker.log(f"Error in workflow: {e}", "red")
             raise
     
-    def process_set(self, worker: SirilWorker, set_name: str):
-        """Process a single set folder."""
-        set_path = Path(self.working_dir) / set_name
-        
-        # Process flats if enabled
-        if self.use_flats_check.isChecked():
-            flats_path = set_path / "flats"
-            if flats_path.exists():
-                worker.log_message.emit(f"Processing flats for {set_name}...", "blue")
-                
-                worker.cmd("cd", str(flats_path))
-                worker.cmd("convert", "flat", "-out=../process")
-                worker.cmd("cd", "../process")
-                worker.cmd("calibrate", "flat")
-                worker.cmd("stack", "pp_flat", "rej", "3", "3", "-norm=mul")
-                worker.cmd("cd", self.working_dir)
+    def set_commands(self, set_name: str, settings: dict, base: str = "") -> List[List[str]]:
+        """Build the Siril commands that calibrate a set.
+        
+        The first command enters the set's flats/ or lights/ folder relative to base,
+        so an absolute base avoids a separate cd into the set folder.
+        """
+        set_path = settings["wd_path"] / set_name
+        commands = []
+        
+        use_flats = settings["use_flats"] and (set_path / "flats").exists()
+        if use_flats:
+            if settings["median_flats"]:
+                flat_stack = ["stack", "pp_flat", "med", "-norm=mul"]
             else:
-                worker.log_message.emit(f"Warning: No flats folder in {set_name}", "orange")
-        
-        # Process lights
-        worker.log_message.emit(f"Processing lights for {set_name}...", "blue")
+                flat_stack = ["stack", "pp_flat", "rej", "3", "3", "-norm=mul"]
+            
+            commands.extend([
+                ["cd", os.path.join(base, "flats")],
+                ["convert", "flat", "-out=../process"],
+                ["cd", "../process"],
+                ["calibrate", "flat"],
+                flat_stack,
+                ["cd", "../lights"],
+            ])
+        else:
+            commands.append(["cd", os.path.join(base, "lights")])
         
-        lights_path = set_path / "lights"
-        worker.cmd("cd", str(lights_path))
-        worker.cmd("convert", "light", "-out=../process")
-        worker.cmd("cd", "../process")
+        commands.extend([
+            ["convert", "light", "-out=../process"],
+            ["cd", "../process"],
+        ])
         
         # Build calibration command
-        bias_coeff = int(self.bias_coeff_spin.value())
+        bias_coeff = int(settings["bias_coefficient"])
         calib_args = ["calibrate", "light", f'-bias="={bias_coeff}*$OFFSET"']
         
-        if self.use_flats_check.isChecked() and (set_path / "process" / "pp_flat_stacked.fit").exists():
+        if use_flats:
             calib_args.append("-flat=pp_flat_stacked")
         
-        if self.debayer_check.isChecked():
+        if settings["debayer"]:
             calib_args.extend(["-cfa", "-equalize_cfa", "-debayer"])
         
-        worker.cmd(*calib_args)
-        worker.cmd("cd", self.working_dir)
+        commands.append(calib_args)
+        return commands
+    
+    def process_set(self, worker: SirilWorker, set_name: str, settings: dict, progress_step: int = 0):
+        """Process a single set folder through the connected Siril instance."""
+        set_path = settings["wd_path"] / set_name
+        
+        if settings["use_flats"] and not (set_path / "flats").exists():
+            worker.log(f"Warning: No flats folder in {set_name}", "orange")
+        
+        worker.log(f"Calibrating {set_name}...", "blue")
+        for args in self.set_commands(set_name, settings, base=str(set_path)):
+            worker.cmd(*args)
         
-        worker.log_message.emit(f"Completed {set_name}", "green")
+        worker.log(f"Completed {set_name}", "green")
+        worker.add_progress(progress_step)
     
-    def combine_sequences(self, worker: SirilWorker, seq_name: str):
-        """Combine all calibrated lights using symbolic links with renamed files."""
-        combined_dir = Path(self.working_dir) / "multi_night_combined"
+    @staticmethod
+    def siril_cli_version(siril_cli: str) -> str:
+        """Report the version of a siril-cli executable."""
+        try:
+            result = subprocess.run([siril_cli, "--version"], capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.SubprocessError) as e:
+            return f"version unknown ({e})"
+        output = (result.stdout or result.stderr).strip()
+        return output.splitlines()[0] if output else "version unknown"
+    
+    def process_set_cli(self, worker: SirilWorker, set_name: str, settings: dict, siril_cli: str,
+                        limits: List[List[str]], progress_step: int = 0):
+        """Process a single set folder in a headless siril-cli instance, under the given resource limits."""
+        set_path = settings["wd_path"] / set_name
+        
+        if settings["use_flats"] and not (set_path / "flats").exists():
+            worker.log(f"Warning: No flats folder in {set_name}", "orange")
+        
+        commands = self.set_commands(set_name, settings)
+        script_lines = ["requires 1.2.0"] + [" ".join(args) for args in limits + commands]
+        
+        with tempfile.NamedTemporaryFile("w", prefix=f"mns_{set_name}_", suffix=".ssf",
+                                         delete=False) as script:
+            script.write("\n".join(script_lines) + "\n")
+        
+        worker.log(f"Calibrating {set_name} ({len(commands)} commands)...", "blue")
+        try:
+            result = subprocess.run(
+                [siril_cli, "-d", str(set_path), "-s", script.name],
+                capture_output=True, text=True
+            )
+        finally:
+            os.unlink(script.name)
+        
+        if result.returncode != 0:
+            worker.log(f"siril-cli failed for {set_name}:\n{result.stderr or result.stdout}", "red")
+            raise RuntimeError(f"Calibration of {set_name} failed")
+        
+        # Show the end of Siril's output, which summarises the calibration
+        for line in result.stdout.strip().splitlines()[-10:]:
+            worker.log(f"[{set_name}] {line}")
+        
+        worker.log(f"Completed {set_name}", "green")
+        worker.add_progress(progress_step)
+    
+    @staticmethod
+    def replace_link(link, src: str, dst: str):
+        """Create dst with link(src, dst), replacing a link from a previous run."""
+        try:
+            link(src, dst)
+        except FileExistsError:
+            os.unlink(dst)
+            link(src, dst)
+    
+    @classmethod
+    def link_frames(cls, pairs: List[Tuple[str, str]]) -> int:
+        """Hard link each (source, destination) pair, using symbolic links if hard links fail.
+        
+        Returns the number of frames that had to be symbolically linked.
+        """
+        link = os.link
+        symlinked = 0
+        for src, dst in pairs:
+            try:
+                cls.replace_link(link, src, dst)
+            except OSError as e:
+                # Sets on another filesystem, or one without hard link support (e.g. exFAT)
+                if link is os.symlink or e.errno not in cls._NO_HARDLINK_ERRNOS:
+                    raise
+                link = os.symlink
+                cls.replace_link(link, src, dst)
+            if link is os.symlink:
+                symlinked += 1
+        return symlinked
+    
+    def link_frames_uring(self, pairs: List[Tuple[str, str]], batch_size: int = 256) -> int:
+        """Hard link all pairs through io_uring, one submission per batch of linkat requests."""
+        ring = liburing.io_uring()
+        cqe = liburing.io_uring_cqe()
+        liburing.io_uring_queue_init(batch_size, ring, 0)
+        
+        symlinked = 0
+        try:
+            for start in range(0, len(pairs), batch_size):
+                batch = pairs[start:start + batch_size]
+                # Keep the encoded paths alive until their completions are reaped
+                encoded = [(os.fsencode(src), os.fsencode(dst)) for src, dst in batch]
+                for src, dst in encoded:
+                    sqe = liburing.io_uring_get_sqe(ring)
+                    liburing.io_uring_prep_linkat(sqe, src, dst)
+                liburing.io_uring_submit(ring)
+                
+                failed = 0
+                for _ in encoded:
+                    liburing.io_uring_wait_cqe(ring, cqe)
+                    if cqe.res < 0:
+                        failed += 1
+                    liburing.io_uring_cqe_seen(ring, cqe)
+                
+                if failed:
+                    # Usually links left over from a previous run; redo the batch synchronously
+                    symlinked += self.link_frames(batch)
+        finally:
+            liburing.io_uring_queue_exit(ring)
+        
+        return symlinked
+    
+    def combine_sequences(self, worker: SirilWorker, seq_name: str, sets: List[str],
+                          settings: dict) -> List[str]:
+        """Combine all calibrated lights using links with renamed files, returning the link paths."""
+        combined_str = str(settings["combined_dir"])
+        wd_str = str(settings["wd_path"])
+        pp_light_re = self._PP_LIGHT_RE
         
         frame_counter = 1
+        link_jobs = []
         
-        # For each set, create symbolic links to pp_light files with new naming
-        for set_name in self.detected_sets:
-            set_process_dir = Path(self.working_dir) / set_name / "process"
-            pp_light_files = sorted(set_process_dir.glob("pp_light_*.fit"))
+        # Number every frame up front so naming stays deterministic, one job per set folder
+        for set_name in sets:
+            set_process_dir = f"{wd_str}/{set_name}/process"
+            try:
+                with os.scandir(set_process_dir) as entries:
+                    indexed = []
+                    for entry in entries:
+                        match = pp_light_re.match(entry.name)
+                        if match:
+                            indexed.append((int(match.group(1)), entry.path))
+            except FileNotFoundError:
+                indexed = []
+            
+            # Siril numbers frames densely, so order them by placing each at its index.
+            # Duplicate indices (pp_light_1 vs pp_light_00001) or stray high indices
+            # would lose frames or waste memory, so sort those cases instead.
+            indices = {index for index, _ in indexed}
+            max_index = max(indices) if indices else 0
+            if len(indices) == len(indexed) and max_index <= 2 * len(indexed):
+                slots = [None] * (max_index + 1)
+                for index, path in indexed:
+                    slots[index] = path
+                pp_light_files = [path for path in slots if path is not None]
+            else:
+                pp_light_files = [path for _, path in sorted(indexed)]
             
             if pp_light_files:
-                worker.log_message.emit(f"Linking {len(pp_light_files)} files from {set_name}", "blue")
+                worker.log(f"Linking {len(pp_light_files)} files from {set_name}", "blue")
                 
-                # Create symbolic links with unified naming
-                for fit_file in pp_light_files:
-                    link_name = combined_dir / f"{seq_name}_{frame_counter:05d}.fit"
-                    if link_name.exists():
-                        link_name.unlink()  # Remove existing link
-                    link_name.symlink_to(fit_file)
+                pairs = []
+                for src in pp_light_files:
+                    pairs.append((src, f"{combined_str}/{seq_name}_{frame_counter:05d}.fit"))
                     frame_counter += 1
+                link_jobs.append(pairs)
             else:
-                worker.log_message.emit(f"Warning: No pp_light files found in {set_name}", "orange")
+                worker.log(f"Warning: No pp_light files found in {set_name}", "orange")
         
-        worker.log_message.emit(f"Created {frame_counter - 1} symbolic links", "green")
+        linked = sum(len(pairs) for pairs in link_jobs)
+        symlinked = None
+        if LIBURING_AVAILABLE:
+            worker.log("Linking frames with io_uring", "blue")
+            try:
+                symlinked = self.link_frames_uring([pair for pairs in link_jobs for pair in pairs])
+            except OSError as e:
+                worker.log(f"io_uring unavailable ({e}), linking with threads", "orange")
+        elif liburing is not None:
+            worker.log("Installed liburing API is not supported (needs liburing==2024.5.3), "
+                       "linking with threads", "orange")
+        
+        if symlinked is None:
+            worker.log("Linking frames with a thread pool", "blue")
+            # Link the sets concurrently; os.link releases the GIL
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                symlinked = sum(executor.map(self.link_frames, link_jobs))
+        
+        worker.log(f"Linked {linked} frames", "green")
+        if symlinked:
+            worker.log(f"{symlinked} frames could not be hard linked and were symbolically linked instead",
+                       "orange")
+        return [dst for pairs in link_jobs for _, dst in pairs]
+    
+    @staticmethod
+    def prefetch_budget() -> int:
+        """Bytes of frames worth prefetching: half of the currently available memory."""
+        try:
+            return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 2
+        except (AttributeError, ValueError, OSError):
+            return 0
+    
+    @staticmethod
+    def frames_within(paths: List[str], budget: int) -> List[str]:
+        """Return the leading frames whose combined size fits in budget bytes."""
+        selected = []
+        for path in paths:
+            try:
+                budget -= os.stat(path).st_size
+            except OSError:
+                continue
+            if budget < 0:
+                break
+            selected.append(path)
+        return selected
+    
+    @staticmethod
+    def advise_frames(paths: List[str], advice: int):
+        """Pass a posix_fadvise hint to the kernel for each frame file."""
+        def advise(path):
+            # Hints are best effort; an unreadable frame is left for Siril to report
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                return
+            try:
+                os.posix_fadvise(fd, 0, 0, advice)
+            except OSError:
+                pass  # e.g. filesystems that reject the hint
+            finally:
+                os.close(fd)
+        
+        # Each hint is an independent syscall, so issue them concurrently
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            list(executor.map(advise, paths))
     
-    def register_combined(self, worker: SirilWorker, seq_name: str):
+    def register_combined(self, worker: SirilWorker, seq_name: str, settings: dict):
         """Register all frames across all nights."""
-        combined_dir = Path(self.working_dir) / "multi_night_combined"
-        worker.cmd("cd", str(combined_dir))
+        worker.cmd("cd", str(settings["combined_dir"]))
         
-        worker.log_message.emit("Registering combined sequence...", "blue")
+        worker.log("Registering combined sequence...", "blue")
         worker.cmd("register", seq_name)
         
-        worker.cmd("cd", self.working_dir)
+        worker.cmd("cd", str(settings["wd_path"]))
     
-    def stack_combined(self, worker: SirilWorker, seq_name: str):
+    def stack_combined(self, worker: SirilWorker, seq_name: str, settings: dict):
         """Stack the registered combined sequence."""
-        combined_dir = Path(self.working_dir) / "multi_night_combined"
-        worker.cmd("cd", str(combined_dir))
+        worker.cmd("cd", str(settings["combined_dir"]))
         
         # Build stack command
-        sigma_low = self.sigma_low_spin.value()
-        sigma_high = self.sigma_high_spin.value()
+        sigma_low = settings["sigma_low"]
+        sigma_high = settings["sigma_high"]
         
         stack_args = ["stack", f"r_{seq_name}", "rej", str(sigma_low), str(sigma_high)]
         stack_args.append("-norm=addscale")
         
-        if self.normalize_check.isChecked():
+        if settings["output_normalization"]:
             stack_args.append("-output_norm")
         
-        if self.rgb_equal_check.isChecked():
+        if settings["rgb_equalization"]:
             stack_args.append("-rgb_equal")
         
         stack_args.extend(["-out=../" + seq_name + "_stacked"])
         
         worker.cmd(*stack_args)
         
-        worker.cmd("cd", self.working_dir)
+        worker.cmd("cd", str(settings["wd_path"]))
     
     def on_processing_finished(self, success: bool, message: str):
         """Handle processing completion."""
+        self.poll_timer.stop()
+        self.poll_worker()
         self.start_button.setEnabled(True)
         
+        if self._close_requested:
+            # The window is waiting to close; save settings off the GUI thread, then close
+            task = BackgroundTask(self.write_settings, self.config_settings())
+            task.signals.finished.connect(self.on_settings_saved)
+            task.signals.failed.connect(self.on_settings_saved)
+            QThreadPool.globalInstance().start(task)
+            return
+        
         if success:
-            seq_name = self.seq_name_edit.text().strip()
+            seq_name = self._run_settings["sequence_name"]
             QMessageBox.information(
                 self, "Processing Complete",
                 f"Multi-night stacking complete!\n\n"
-                f"Processed {len(self.detected_sets)} nights\n"
+                f"Processed {len(self._run_sets)} nights\n"
                 f"Final result: {seq_name}_stacked.fit\n\n"
                 f"You can now open the result in Siril for further processing."
             )
         else:
             QMessageBox.warning(self, "Processing Error", f"Processing failed: {message}")
     
-    def save_preset(self):
-        """Save current settings to preset file."""
-        preset_data = {
-            "sequence_name": self.seq_name_edit.text(),
+    def current_settings(self) -> dict:
+        """Collect the processing settings from the GUI."""
+        return {
+            "sequence_name": self.seq_name_edit.text().strip(),
             "bias_coefficient": self.bias_coeff_spin.value(),
             "use_flats": self.use_flats_check.isChecked(),
+            "median_flats": self.median_flats_check.isChecked(),
             "debayer": self.debayer_check.isChecked(),
+            "parallel_cli": self.parallel_cli_check.isChecked(),
             "sigma_high": self.sigma_high_spin.value(),
             "sigma_low": self.sigma_low_spin.value(),
             "output_normalization": self.normalize_check.isChecked(),
             "rgb_equalization": self.rgb_equal_check.isChecked(),
         }
+    
+    def save_preset(self):
+        """Save current settings to preset file."""
+        preset_data = self.current_settings()
         
         file_path, _ = QFileDialog.getSaveFileName(
             self, "Save Preset", "", "JSON Files (*.json)"
@@ -608,9 +1086,11 @@ class MultiNightStackerGUI(QMainWindow):
                 with open(file_path, 'r') as f:
                     preset_data = json.load(f)
                 
-                self.seq_name_edit.setText(preset_data.get("sequence_name", datetime.now().strftime("%Y%m%d_seq")))
+                self.seq_name_edit.setText(preset_data.get("sequence_name", self._default_seq_name))
                 self.bias_coeff_spin.setValue(preset_data.get("bias_coefficient", 8))
                 self.use_flats_check.setChecked(preset_data.get("use_flats", True))
+                self.median_flats_check.setChecked(preset_data.get("median_flats", True))
+                self.parallel_cli_check.setChecked(preset_data.get("parallel_cli", True))
                 self.debayer_check.setChecked(preset_data.get("debayer", True))
                 self.sigma_high_spin.setValue(preset_data.get("sigma_high", 3.0))
                 self.sigma_low_spin.setValue(preset_data.get("sigma_low", 3.0))
@@ -622,39 +1102,85 @@ class MultiNightStackerGUI(QMainWindow):
             except Exception as e:
                 QMessageBox.warning(self, "Load Error", f"Failed to load preset: {e}")
     
-    def save_settings(self):
-        """Save current settings to config file."""
-        config_path = Path.home() / ".multi_night_stacker_config.json"
-        
-        settings = {
+    def config_settings(self) -> dict:
+        """Collect the settings kept in the config file."""
+        return {
             "last_directory": self.working_dir,
             "bias_coefficient": self.bias_coeff_spin.value(),
         }
+    
+    def save_settings(self):
+        """Save current settings to config file."""
+        self.write_settings(self.config_settings())
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def config_path() -> str:
+        """Location of the config file."""
+        return os.path.expanduser("~/.multi_night_stacker_config.json")
+    
+    @classmethod
+    def write_settings(cls, settings: dict):
+        """Write settings to the config file."""
+        config_path = cls.config_path()
         
+        tmp_path = None
         try:
-            with open(config_path, 'w') as f:
-                json.dump(settings, f, indent=2)
+            # Write a compact file next to the config and swap it in, so an
+            # interrupted write can't leave a half-written config behind
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(config_path), prefix=".multi_night_stacker_",
+                                            suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                f.write(json.dumps(settings, separators=(',', ':')))
+            os.replace(tmp_path, config_path)
         except:
-            pass
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
     
     def load_settings(self):
         """Load settings from config file."""
-        config_path = Path.home() / ".multi_night_stacker_config.json"
+        # Open directly rather than checking for the file first
+        try:
+            with open(self.config_path(), 'r') as f:
+                settings = json.load(f)
+        except (OSError, ValueError):
+            # ValueError covers both JSONDecodeError and UnicodeDecodeError
+            return
         
-        if config_path.exists():
-            try:
-                with open(config_path, 'r') as f:
-                    settings = json.load(f)
-                
-                if "bias_coefficient" in settings:
-                    self.bias_coeff_spin.setValue(settings["bias_coefficient"])
-                    
-            except:
-                pass
+        # Ignore malformed values rather than failing to open the window
+        if not isinstance(settings, dict):
+            return
+        
+        bias_coeff = settings.get("bias_coefficient")
+        if (isinstance(bias_coeff, (int, float)) and not isinstance(bias_coeff, bool)
+                and math.isfinite(bias_coeff)):
+            self.bias_coeff_spin.setValue(bias_coeff)
+    
+    def on_settings_saved(self, _result=None):
+        """Finish a close that was deferred while the worker stopped."""
+        self._settings_saved = True
+        if self.worker:
+            self.worker.wait()  # run() returns right after emitting finished
+        self.close()
     
     def closeEvent(self, event):
         """Handle window close."""
-        self.save_settings()
+        if self.worker and self.worker.isRunning():
+            # Don't block the GUI; the worker stops after its current step and
+            # on_processing_finished completes the close
+            if not self._close_requested:
+                self._close_requested = True
+                self.worker.requestInterruption()
+                self.statusBar().showMessage("Stopping...")
+                self.log("Stopping after the current step...", "orange")
+            event.ignore()
+            return
+        
+        if not self._settings_saved:
+            self.save_settings()
         event.accept()
 
 